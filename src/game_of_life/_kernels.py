@@ -0,0 +1,190 @@
+"""Compiled kernels used by the board
+
+Numba is an optional dependency. When it is not installed every kernel
+is None and the board falls back to the NumPy implementation. The CUDA
+kernel also needs numba.cuda and a GPU at run time.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+try:
+    from numba import cuda
+except ImportError:
+    cuda = None
+
+
+if njit is not None:
+
+    @njit(parallel=True, boundscheck=False, cache=True)
+    def step_kernel(padded, out):
+        """Computes the next generation of a board with a border of dead cells into out
+
+        Args:
+            padded (np.ndarray): current state with one dead cell around the board
+            out (np.ndarray): array (rows, cols) for the next state
+        """
+
+        rows, cols = out.shape
+        for row in prange(rows):
+            for col in range(cols):
+                alive = (padded[row, col] + padded[row, col + 1] + padded[row, col + 2]
+                         + padded[row + 1, col] + padded[row + 1, col + 2]
+                         + padded[row + 2, col] + padded[row + 2, col + 1] + padded[row + 2, col + 2])
+                cell = padded[row + 1, col + 1]
+                if alive == 3 or (alive == 2 and cell == 1):
+                    out[row, col] = 1
+                else:
+                    out[row, col] = 0
+
+
+    @njit(parallel=True, boundscheck=False, cache=True)
+    def step_n_kernel(matrix, out, steps, band, history):
+        """Computes the generation steps ahead of matrix into out
+
+        The board is split into bands of rows. Every band is copied together
+        with steps rows above and below it into a small buffer and goes
+        through all generations there, so the buffer stays in the cache.
+        The extra rows absorb the error coming from the cut edges: after t
+        generations only t rows next to a cut are wrong.
+
+        Args:
+            matrix (np.ndarray): current state
+            out (np.ndarray): array of the same shape for the final state
+            steps (int): number of generations
+            band (int): number of rows in one band
+            history (np.ndarray): array (at least steps, rows, cols) for every generation
+                or an empty array when they are not needed
+        """
+
+        rows, cols = matrix.shape
+        record = history.shape[0] > 0
+        for number in prange((rows + band - 1) // band):
+            start = number * band
+            stop = min(start + band, rows)
+            low = max(start - steps, 0)
+            high = min(stop + steps, rows)
+            height = high - low
+            current = np.zeros((height + 2, cols + 2), dtype=matrix.dtype)
+            following = np.zeros_like(current)
+            current[1:height + 1, 1:cols + 1] = matrix[low:high]
+            for t in range(steps):
+                margin = steps - t - 1
+                first = max(start - margin, low) - low + 1
+                last = min(stop + margin, high) - low + 1
+                for i in range(first, last):
+                    for j in range(1, cols + 1):
+                        alive = (current[i - 1, j - 1] + current[i - 1, j] + current[i - 1, j + 1]
+                                 + current[i, j - 1] + current[i, j + 1]
+                                 + current[i + 1, j - 1] + current[i + 1, j] + current[i + 1, j + 1])
+                        if alive == 3 or (alive == 2 and current[i, j] == 1):
+                            following[i, j] = 1
+                        else:
+                            following[i, j] = 0
+                current, following = following, current
+                if record:
+                    history[t, start:stop] = current[start - low + 1:stop - low + 1, 1:cols + 1]
+            out[start:stop] = current[start - low + 1:stop - low + 1, 1:cols + 1]
+
+
+    _ONE = np.uint64(1)
+    _LAST_BIT = np.uint64(63)
+
+
+    @njit(boundscheck=False, cache=True)
+    def _add_three(a, b, c):
+        """Adds three bit planes, returns the sum and carry planes"""
+
+        partial = a ^ b
+        return partial ^ c, (a & b) | (partial & c)
+
+
+    @njit(boundscheck=False, cache=True)
+    def _row_planes(bits, row, word):
+        """Returns the west, middle and east neighbours of one word of a row"""
+
+        words = bits.shape[1]
+        middle = bits[row, word]
+        west = middle << _ONE
+        east = middle >> _ONE
+        if word > 0:
+            west |= bits[row, word - 1] >> _LAST_BIT
+        if word < words - 1:
+            east |= bits[row, word + 1] << _LAST_BIT
+        return west, middle, east
+
+
+    @njit(parallel=True, boundscheck=False, cache=True)
+    def step_packed_kernel(bits, out, last_mask):
+        """Computes the next generation of a board packed 64 cells per uint64 word
+
+        Every word is computed from the three words above it, next to it and
+        below it with a carry-save adder, so the neighbour planes are never
+        stored in memory.
+
+        Args:
+            bits (np.ndarray): current state, array (rows, words) of uint64
+            out (np.ndarray): array of the same shape for the next state
+            last_mask (np.uint64): bits of the last word which are on the board
+        """
+
+        rows, words = bits.shape
+        zero = np.uint64(0)
+        for row in prange(rows):
+            for word in range(words):
+                if row > 0:
+                    up_west, up, up_east = _row_planes(bits, row - 1, word)
+                else:
+                    up_west, up, up_east = zero, zero, zero
+                if row < rows - 1:
+                    down_west, down, down_east = _row_planes(bits, row + 1, word)
+                else:
+                    down_west, down, down_east = zero, zero, zero
+                west, middle, east = _row_planes(bits, row, word)
+                ones_a, twos_a = _add_three(up_west, up, up_east)
+                ones_b, twos_b = _add_three(down_west, down, down_east)
+                ones, twos_d = _add_three(ones_a, ones_b, west ^ east)
+                twos, fours_a = _add_three(twos_a, twos_b, west & east)
+                fours_b = twos & twos_d
+                twos ^= twos_d
+                value = twos & ~(fours_a | fours_b) & (ones | middle)
+                if word == words - 1:
+                    value &= last_mask
+                out[row, word] = value
+
+else:
+    step_kernel = None
+    step_n_kernel = None
+    step_packed_kernel = None
+
+
+if cuda is not None:
+
+    @cuda.jit
+    def cuda_step_kernel(matrix, out):
+        """Computes the next generation of one cell per thread
+
+        Args:
+            matrix (DeviceNDArray): current state
+            out (DeviceNDArray): array of the same shape for the next state
+        """
+
+        row, col = cuda.grid(2)
+        rows, cols = matrix.shape
+        if row < rows and col < cols:
+            alive = 0
+            for r in range(max(row - 1, 0), min(row + 2, rows)):
+                for c in range(max(col - 1, 0), min(col + 2, cols)):
+                    alive += matrix[r, c]
+            alive -= matrix[row, col]
+            if alive == 3 or (alive == 2 and matrix[row, col] == 1):
+                out[row, col] = 1
+            else:
+                out[row, col] = 0
+
+else:
+    cuda_step_kernel = None
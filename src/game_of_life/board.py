@@ -1,31 +1,101 @@
+import hashlib
+from collections import Counter
 import numpy as np
+from ._kernels import cuda, cuda_step_kernel, step_kernel, step_n_kernel, step_packed_kernel
+
+SPARSE_DENSITY = 0.0005
+"""Fraction of alive cells below which step() switches to step_sparse()"""
+
+SPARSE_CHECK_STEPS = 16
+"""Number of dense steps after which the alive cells are counted again"""
+
+BAND_BYTES = 32 * 1024
+"""Size of the band of rows which step_n() keeps in the cache"""
+
+ROW_HASH_CELLS = 200 * 200
+"""Fewest cells for which state_key() hashes rows separately, smaller boards are hashed whole"""
+
+MIN_CHUNK_STEPS = 8
+"""Fewest generations step_n() computes per band at once, below it plain steps are faster"""
+
+NUMPY_BAND_BYTES = 256 * 1024
+"""Size of the band of rows which the NumPy step processes at once"""
+
+CUDA_BLOCK = (16, 16)
+"""Number of threads in one CUDA block"""
+
+TILE_BITS = 64 if step_n_kernel is not None else 65536
+"""Largest rows * (cols + 1) for which step_n() keeps the whole board in one Python int
+
+With Numba the compiled kernels are faster for boards larger than one word.
+"""
+
+_NEIGHBOUR_OFFSETS = tuple((d_row, d_col) for d_row in (-1, 0, 1) for d_col in (-1, 0, 1) if d_row or d_col)
 
 class Board:
 
     """This class represents the board in Conway's Game of Life.
     """
 
-    def __init__(self, rows, cols):
+    def __init__(self, rows, cols, backend='cpu'):
 
         """
         Initialize the board
 
         :param rows: number of rows
         :param cols: number od columns
+        :param backend: 'cpu' or 'cuda', with 'cuda' the generations are computed on the GPU (needs numba.cuda)
 
         """
         if rows <= 0 or cols <= 0:
             raise ValueError("Number of rows and columns should be positive.")
+        if backend not in ('cpu', 'cuda'):
+            raise ValueError("Backend should be 'cpu' or 'cuda'.")
+        if backend == 'cuda' and (cuda_step_kernel is None or not cuda.is_available()):
+            raise ValueError("CUDA backend is not available.")
+        self.backend = backend
         self.cols = cols
         self.rows = rows
         self.step_count = 0
-        self.matrix = np.zeros((rows,cols), dtype = int)
+        self._buffers = None
+        self._current = 0
+        self.matrix = np.zeros((rows,cols), dtype = np.uint8)
+
+    @property
+    def matrix(self):
+        """Current generation
+
+        The board keeps two buffers and every step writes the next generation
+        into the one which is not current, so the returned array is reused
+        two steps later. Use np.copy to keep a generation. Each buffer has a
+        border of dead cells around the board and the matrix is a view of its
+        inside, so the steps read the neighbours of edge cells without any
+        checks.
+
+        Returns:
+            np.ndarray: uint8 matrix with values 0 or 1
+        """
+
+        return self._buffers[self._current, 1:-1, 1:-1]
+
+    @matrix.setter
+    def matrix(self, value):
+        value = np.asarray(value)
+        self.rows, self.cols = value.shape
+        if self._buffers is None or self._buffers.shape[1:] != (self.rows + 2, self.cols + 2):
+            self._buffers = np.zeros((2, self.rows + 2, self.cols + 2), dtype=np.uint8)
+        self.matrix[...] = value
+        self._sparse_countdown = 0
+        self._neighbours = None
+        self._row_hashes = np.zeros(self.rows, dtype=np.uint64)
+        self._hashed = None
         
     def clear(self):
         """This method clears the board"""
 
         self.step_count = 0
         self.matrix.fill(0)
+        self._sparse_countdown = 0
 
     def empty(self) -> bool:
         """This method checks whether the board has no alive cells.
@@ -33,7 +103,7 @@ class Board:
         Returns:
             bool:  It is True whether the cells: 0. Otherwise it it False 
         """
-        return np.all(self.matrix == 0)
+        return not self.matrix.any()
 
     def copy(self):
         """Creates a copy of the board
@@ -41,9 +111,39 @@ class Board:
         Returns:
             Board:new board a new board with copied grid and step count
         """
-        new_board = Board(self.rows, self.cols)
-        new_board.matrix = np.copy(self.matrix)
-        new_board.step_count = self.step_count
+        new_board = self._empty_like(self)
+        np.copyto(new_board.matrix, self.matrix)
+        if self._hashed is not None:
+            np.copyto(new_board._row_hashes, self._row_hashes)
+            new_board._hashed = self._hashed.copy()
+        return new_board
+
+    @classmethod
+    def _empty_like(cls, board):
+        """Creates a board of the same size without filling its cells
+
+        __init__ is skipped, so the buffers are not zeroed just to be
+        overwritten by the caller.
+
+        Args:
+            board (Board): board whose size, backend and step count are used
+
+        Returns:
+            Board: new board with undefined cells
+        """
+
+        new_board = cls.__new__(cls)
+        new_board.backend = board.backend
+        new_board.rows = board.rows
+        new_board.cols = board.cols
+        new_board.step_count = board.step_count
+        new_board._buffers = np.empty_like(board._buffers)
+        _clear_border(new_board._buffers)
+        new_board._current = 0
+        new_board._sparse_countdown = 0
+        new_board._neighbours = None
+        new_board._row_hashes = np.zeros(board.rows, dtype=np.uint64)
+        new_board._hashed = None
         return new_board
     
     def set_cell_value(self, row, col, state):
@@ -63,6 +163,48 @@ class Board:
         if not (0 <= row < self.rows) or not (0 <= col < self.cols):
             raise IndexError("Komorka jest poza plansza")
         self.matrix[row, col] = state
+        self._sparse_countdown = 0
+
+    def set_cells(self, cells, state=1):
+        """Sets one value in many cells at once
+
+        Args:
+            cells (list or np.ndarray): (row, col) of every cell
+            state (int): 0 if cells are dead or 1 if cells are alive
+
+        Raises:
+            ValueError: whether state is not 0 or 1 or cells are not (row, col) pairs
+            IndexError: if a cell is outside the board
+        """
+        rows, cols = self._cell_indices(cells, state)
+        self.matrix[rows, cols] = state
+        self._sparse_countdown = 0
+
+    def _cell_indices(self, cells, state):
+        """Checks cells for set_cells() and splits them into row and column indices
+
+        Args:
+            cells (list or np.ndarray): (row, col) of every cell
+            state (int): 0 or 1
+
+        Raises:
+            ValueError: whether state is not 0 or 1 or cells are not (row, col) pairs
+            IndexError: if a cell is outside the board
+
+        Returns:
+            tuple: array of rows and array of columns
+        """
+        if state not in (0, 1):
+            raise ValueError("W komorce musi byc wartosc 0-1")
+        cells = np.asarray(cells, dtype=np.intp)
+        if cells.size == 0:
+            cells = cells.reshape(0, 2)
+        if cells.ndim != 2 or cells.shape[1] != 2:
+            raise ValueError("Komorki musza byc parami (wiersz, kolumna)")
+        rows, cols = cells[:, 0], cells[:, 1]
+        if ((rows < 0) | (rows >= self.rows) | (cols < 0) | (cols >= self.cols)).any():
+            raise IndexError("Komorka jest poza plansza")
+        return rows, cols
 
     def get_cell_value(self, row, col):
 
@@ -95,25 +237,21 @@ class Board:
            
         """
 
-        with open(file, 'r') as file_name:
-            lines = file_name.readlines()
+        with open(file, 'rb') as file_name:
+            lines = [line.strip() for line in file_name.read().splitlines()]
         if not lines:
             raise ValueError("Pusty plik")
-        lines_length = len(lines[0].strip())
-        for line in lines:
-            if len(line.strip()) != lines_length:
-                raise ValueError("W pliku jest zla liczba kolumn")
-            if any (symbol not in ('0', '1') for symbol in line.strip()):
-                raise ValueError("Nieprawidlowe wartosci komorek w pliku")
+        lines_length = len(lines[0])
+        if any(len(line) != lines_length for line in lines):
+            raise ValueError("W pliku jest zla liczba kolumn")
+        matrix = np.frombuffer(b''.join(lines), dtype=np.uint8) - ord('0')
+        if (matrix > 1).any():
+            raise ValueError("Nieprawidlowe wartosci komorek w pliku")
         
-        file_rows = len(lines)
-        self.rows = file_rows
+        self.rows = len(lines)
         self.cols = lines_length
-        self.matrix = np.zeros((self.rows, self.cols), dtype = int)
-        for number_of_row, line in enumerate(lines):
-            for number_of_col, symbol in enumerate(line.strip()):
-                if symbol == '1':
-                    self.matrix[number_of_row, number_of_col] = 1
+        matrix = matrix.reshape(self.rows, self.cols)
+        self.matrix = matrix
         self.step_count = 0
     
     def save_board_to_file(self, file):
@@ -123,10 +261,8 @@ class Board:
             file (str): path
         """
 
-        with open(file, 'w') as file_name:
-            for row in range(self.rows):
-                line = ''.join(str(self.matrix[row, col]) for col in range(self.cols))
-                file_name.write(line + '\n')
+        with open(file, 'wb') as file_name:
+            file_name.write(self._render('1', '0'))
 
     def random_board(self, density=0.2):
         """Responsible for filling the board with random values (0 or 1)
@@ -139,18 +275,15 @@ class Board:
 
         if not (0 <= density <= 1):
             raise ValueError("Prawdopodobienstwo wystapienia zywej komorki powinno byc z przedzialu 0-1")
-        self.matrix = np.random.choice([0, 1], size=(self.rows, self.cols), p=[1-density, density])
+        self.matrix = np.random.random_sample((self.rows, self.cols)) < density
         self.step_count = 0
 
     def show_board(self):
 
         """Prints the board
         """
-        print(f"Step: {self.step_count}")
-        for row in range(self.rows):
-            line = ''.join('*' if self.matrix[row, col] == 1 else ' ' for col in range(self.cols))
-            print(line)
-        print("\n" + "-" * self.cols + "\n")
+        lines = self._render('*', ' ').decode('ascii')
+        print(f"Step: {self.step_count}\n" + lines + "\n" + "-" * self.cols + "\n")
         
 
     def count_alive(self, row, col):
@@ -168,39 +301,246 @@ class Board:
 
         if not (0 <= row < self.rows) or not (0 <= col < self.cols):
             raise IndexError("Komorka jest poza plansza")
-        number = 0
-        for r in range(row - 1, row + 2):
-            for c in range(col - 1, col + 2):
-                if (0 <= r < self.rows) and (0 <= c < self.cols):
-                    if (r != row or c != col) and self.matrix[r, c] == 1:
-                        number += 1
-        return number
+        neighbourhood = self.matrix[max(row - 1, 0):row + 2, max(col - 1, 0):col + 2]
+        return int(neighbourhood.sum()) - int(self.matrix[row, col])
 
     def step(self):
         """One iteration of game of life
+
+        Boards with very few alive cells are handled by step_sparse().
+        Otherwise the compiled kernel is used when Numba is installed and
+        the neighbours are counted with NumPy when it is not.
         """
 
-        new_matrix = np.copy(self.matrix)
-        for row in range(self.rows):
-            for col in range(self.cols):
-                alive = self.count_alive(row, col)
-                if self.matrix[row, col] == 1:
-                    if alive < 2 or alive > 3:
-                        new_matrix[row, col] = 0
-                else:
-                    if alive == 3:
-                        new_matrix[row, col] = 1
-        self.matrix = new_matrix
+        if self.backend == 'cuda':
+            self._step_cuda(1)
+            return
+        if self._is_sparse():
+            self.step_sparse()
+            return
+        new_matrix = self._next_matrix()
+        if step_kernel is not None:
+            step_kernel(self._buffers[self._current], new_matrix)
+        else:
+            self._step_numpy(new_matrix)
+        self._swap_buffers()
         self.step_count += 1
 
+    def step_n(self, steps, frames=None):
+        """Performs many iterations of game of life
+
+        With Numba the generations are computed band by band (temporal
+        blocking), so each part of the board is read from memory once for
+        a chunk of iterations instead of once per iteration. A band is
+        computed together with chunk rows above and below it, so the chunk
+        is a quarter of the band; when bands are too thin for a chunk of
+        MIN_CHUNK_STEPS generations plain steps are used. With the 'cuda'
+        backend the board is copied to the GPU once for all the iterations.
+
+        Args:
+            steps (int): number of iterations
+            frames (list): if given, np.packbits copies of every new generation are appended to it
+
+        Raises:
+            ValueError: if steps is negative
+        """
+
+        if steps < 0:
+            raise ValueError("Liczba krokow nie moze byc ujemna")
+        if self.backend == 'cuda':
+            self._step_cuda(steps, frames)
+            return
+        sparse = self._is_sparse()
+        if self.rows * (self.cols + 1) <= TILE_BITS and not sparse:
+            self._step_n_tile(steps, frames)
+            return
+        band = max(BAND_BYTES // (self.cols + 2), 1)
+        chunk = band // 4
+        if step_n_kernel is None or sparse or chunk < MIN_CHUNK_STEPS:
+            for _ in range(steps):
+                self.step()
+                if frames is not None:
+                    frames.append(np.packbits(self.matrix))
+            return
+        history_length = min(chunk, steps) if frames is not None else 0
+        history = np.empty((history_length, self.rows, self.cols), dtype=self.matrix.dtype)
+        for done in range(0, steps, chunk):
+            count = min(chunk, steps - done)
+            new_matrix = self._next_matrix()
+            step_n_kernel(self.matrix, new_matrix, count, band, history)
+            if frames is not None:
+                frames.extend(np.packbits(generation) for generation in history[:count])
+            self._swap_buffers()
+            self.step_count += count
+
+    def _step_n_tile(self, steps, frames=None):
+        """Performs iterations of game of life on a small board kept in one Python int
+
+        Every row takes cols + 1 bits, the extra bit is always 0 and keeps
+        the rows apart. A generation is about thirty operations on the whole
+        int, so the board is converted only at the start and at the end.
+
+        Args:
+            steps (int): number of iterations
+            frames (list): if given, np.packbits copies of every new generation are appended to it
+        """
+
+        tile = _Tile(self.rows, self.cols)
+        state = tile.encode(self.matrix)
+        for _ in range(steps):
+            state = tile.step(state)
+            if frames is not None:
+                frames.append(np.packbits(tile.decode(state)))
+        new_matrix = self._next_matrix()
+        new_matrix[...] = tile.decode(state)
+        self._swap_buffers()
+        self.step_count += steps
+
+    def _step_cuda(self, steps, frames=None):
+        """Performs iterations of game of life on the GPU
+
+        The board stays on the device between iterations. The generations
+        for frames are also kept there and copied back together at the end.
+
+        Args:
+            steps (int): number of iterations
+            frames (list): if given, np.packbits copies of every new generation are appended to it
+        """
+
+        current = cuda.to_device(np.ascontiguousarray(self.matrix))
+        following = cuda.device_array_like(current)
+        history = cuda.device_array((steps, self.rows, self.cols), dtype=np.uint8) if frames is not None else None
+        blocks = ((self.rows + CUDA_BLOCK[0] - 1) // CUDA_BLOCK[0], (self.cols + CUDA_BLOCK[1] - 1) // CUDA_BLOCK[1])
+        for number in range(steps):
+            cuda_step_kernel[blocks, CUDA_BLOCK](current, following)
+            if history is not None:
+                history[number].copy_to_device(following)
+            current, following = following, current
+        new_matrix = self._next_matrix()
+        new_matrix[...] = current.copy_to_host()
+        if history is not None:
+            frames.extend(np.packbits(generation) for generation in history.copy_to_host())
+        self._swap_buffers()
+        self.step_count += steps
+
+    def step_sparse(self):
+        """One iteration of game of life which visits only alive cells and their neighbours
+
+        The alive cells are found with one np.nonzero pass and only the cells
+        which changed are written to the matrix, so apart from that pass the
+        cost depends on the number of alive cells and not on the size of the
+        board.
+        """
+
+        alive_rows, alive_cols = np.nonzero(self.matrix)
+        alive = set(zip(alive_rows.tolist(), alive_cols.tolist()))
+        rows, cols = self.rows, self.cols
+        neighbours = Counter()
+        for row, col in alive:
+            for d_row, d_col in _NEIGHBOUR_OFFSETS:
+                r, c = row + d_row, col + d_col
+                if 0 <= r < rows and 0 <= c < cols:
+                    neighbours[(r, c)] += 1
+        new_alive = {cell for cell, number in neighbours.items() if number == 3 or (number == 2 and cell in alive)}
+        died = alive - new_alive
+        born = new_alive - alive
+        _write_cells(self.matrix, died, 0)
+        _write_cells(self.matrix, born, 1)
+        self._sparse = len(new_alive) < SPARSE_DENSITY * self.rows * self.cols
+        self.step_count += 1
+
+    def _next_matrix(self):
+        """Returns the inside of the buffer which is not current, the next generation is written there
+
+        Returns:
+            np.ndarray: view of shape (rows, cols)
+        """
+
+        return self._buffers[1 - self._current, 1:-1, 1:-1]
+
+    def _swap_buffers(self):
+        """Makes the other buffer, which holds the next generation, the current one
+        """
+
+        self._current = 1 - self._current
+
+    def _is_sparse(self) -> bool:
+        """Checks whether the fraction of alive cells is below SPARSE_DENSITY
+
+        The cells are counted every SPARSE_CHECK_STEPS calls and when the
+        board was set again, in between the last answer is used.
+        step_sparse() updates the answer itself after every step.
+
+        Returns:
+            bool: It is True when step_sparse() should be used
+        """
+
+        if self._sparse_countdown <= 0:
+            self._sparse = np.count_nonzero(self.matrix) < SPARSE_DENSITY * self.rows * self.cols
+            self._sparse_countdown = SPARSE_CHECK_STEPS
+        self._sparse_countdown -= 1
+        return self._sparse
+
+    def _step_numpy(self, new_matrix=None):
+        """Computes the next generation with NumPy
+
+        The current buffer has a border of dead cells, so the eight neighbour
+        planes are slices of it with the same shape and strides and are added
+        into one reused array. A cell is alive in the next generation when
+        (neighbours | cell) == 3, so the rule is two operations written
+        straight into new_matrix. Large boards are processed in bands of
+        about NUMPY_BAND_BYTES, so the sums stay in the cache instead of
+        making nine passes over main memory.
+
+        Args:
+            new_matrix (np.ndarray): array for the result, a new one is created when it is not given
+
+        Returns:
+            np.ndarray: matrix of the next generation
+        """
+
+        padded = self._buffers[self._current]
+        rows, cols = self.rows, self.cols
+        if new_matrix is None:
+            new_matrix = np.empty((rows, cols), dtype=np.uint8)
+        band = min(max(NUMPY_BAND_BYTES // cols, 16), rows)
+        if self._neighbours is None or self._neighbours.shape != (band, cols):
+            self._neighbours = np.empty((band, cols), dtype=np.uint8)
+        for start in range(0, rows, band):
+            stop = min(start + band, rows)
+            window = padded[start:stop + 2]
+            neighbours = self._neighbours[:stop - start]
+            np.add(window[:-2, :-2], window[:-2, 1:-1], out=neighbours)
+            neighbours += window[:-2, 2:]
+            neighbours += window[1:-1, :-2]
+            neighbours += window[1:-1, 2:]
+            neighbours += window[2:, :-2]
+            neighbours += window[2:, 1:-1]
+            neighbours += window[2:, 2:]
+            neighbours |= window[1:-1, 1:-1]
+            np.equal(neighbours, 3, out=new_matrix[start:stop])
+        return new_matrix
+
     def __str__(self):
         """Returns a string version of the board"""
 
-        board_str = f"Krok: {self.step_count}\n"
-        for row in range(self.rows):
-            line = ''.join('*' if self.matrix[row, col] == 1 else ' ' for col in range(self.cols))
-            board_str += line + '\n'
-        return board_str
+        return f"Krok: {self.step_count}\n" + self._render('*', ' ').decode('ascii')
+
+    def _render(self, alive, dead) -> bytes:
+        """Converts the matrix to text in one pass
+
+        Args:
+            alive (str): symbol of an alive cell
+            dead (str): symbol of a dead cell
+
+        Returns:
+            bytes: one line per row, each line ends with a newline
+        """
+
+        lines = np.empty((self.rows, self.cols + 1), dtype=np.uint8)
+        lines[:, :-1] = np.where(self.matrix == 1, ord(alive), ord(dead))
+        lines[:, -1] = ord('\n')
+        return lines.tobytes()
     
     def change_to_tuple(self) -> tuple:
         """Changes the matrix to a tuple
@@ -211,6 +551,67 @@ class Board:
 
         return tuple(map(tuple, self.matrix))
     
+    def state_key(self) -> bytes:
+        """Returns a short digest of the cells, used to find repeated states
+
+        Boards smaller than ROW_HASH_CELLS are hashed whole, which is the
+        fastest for them. On larger boards every row has its own hash. The
+        board keeps a copy of the cells from the last call and only the rows
+        which differ from it are hashed again, so boards where a small part
+        moves are cheap and the steps do not have to track changes. The
+        changed rows are packed into 64-bit words and hashed all at once by
+        _hash_rows(), without a Python loop.
+
+        Returns:
+            bytes: 16 byte digest of the cells or of the row hashes
+        """
+
+        matrix = self.matrix
+        if self.rows * self.cols < ROW_HASH_CELLS:
+            return hashlib.blake2b(np.ascontiguousarray(matrix).tobytes(), digest_size=16).digest()
+        if self._hashed is None:
+            self._hashed = np.empty_like(matrix)
+            changed = np.arange(self.rows)
+        else:
+            changed = np.flatnonzero((matrix != self._hashed).any(axis=1))
+        if changed.size:
+            self._hashed[changed] = matrix[changed]
+            self._row_hashes[changed] = _hash_rows(_pack_rows(self._hashed[changed]))
+        return hashlib.blake2b(self._row_hashes.tobytes(), digest_size=16).digest()
+    
+    def pack(self) -> np.ndarray:
+        """Packs the cells into bits, 8 cells in one byte
+
+        Returns:
+            np.ndarray: 1-D uint8 array, it can be turned back into cells with unpack()
+        """
+
+        return np.packbits(self.matrix)
+
+    def unpack(self, packed) -> np.ndarray:
+        """Turns the result of pack() back into a matrix with the shape of this board
+
+        Args:
+            packed (np.ndarray): result of pack() or many of them stacked along the first axis
+
+        Returns:
+            np.ndarray: matrix (or matrices) with values 0 or 1
+        """
+
+        packed = np.asarray(packed)
+        cells = np.unpackbits(packed, axis=-1, count=self.rows * self.cols)
+        return cells.reshape(packed.shape[:-1] + (self.rows, self.cols))
+
+    def load_packed(self, packed):
+        """Sets all cells from the result of pack() of a board of the same size
+
+        Args:
+            packed (np.ndarray): result of pack()
+        """
+
+        np.copyto(self.matrix, self.unpack(packed))
+        self._sparse_countdown = 0
+    
     def next_board(self):
         """Returns the new board which represents the next step
 
@@ -246,6 +647,492 @@ class Board:
         rows = len(state)
         cols = len(state[0]) if rows > 0 else 0
         board = cls(rows, cols)
-        board.matrix = np.array(state, dtype=int)
+        board.matrix = np.array(state, dtype=np.uint8)
         return board
-    
\ No newline at end of file
+
+
+class _Tile:
+
+    """Encoding of a small board as one Python int, used by Board.step_n()
+
+    Cell (row, col) is bit row * (cols + 1) + col. The last bit of every row
+    is a zero gap, so moving the int one bit left or right never carries a
+    cell into the next row.
+    """
+
+    def __init__(self, rows, cols):
+        """Prepares the masks for a board size
+
+        Args:
+            rows (int): number of rows
+            cols (int): number of columns
+        """
+        self.rows = rows
+        self.cols = cols
+        self.width = cols + 1
+        self.board_mask = (1 << (rows * self.width)) - 1
+        row_mask = (1 << cols) - 1
+        self.cells_mask = sum(row_mask << (row * self.width) for row in range(rows))
+
+    def encode(self, matrix) -> int:
+        """Packs a matrix into an int
+
+        Args:
+            matrix (np.ndarray): matrix with values 0 or 1
+
+        Returns:
+            int: the board
+        """
+        padded = np.zeros((self.rows, self.width), dtype=np.uint8)
+        padded[:, :self.cols] = matrix
+        return int.from_bytes(np.packbits(padded, bitorder='little').tobytes(), 'little')
+
+    def decode(self, state) -> np.ndarray:
+        """Unpacks an int created by encode()
+
+        Args:
+            state (int): the board
+
+        Returns:
+            np.ndarray: matrix with values 0 or 1
+        """
+        bits = self.rows * self.width
+        as_bytes = np.frombuffer(state.to_bytes((bits + 7) // 8, 'little'), dtype=np.uint8)
+        cells = np.unpackbits(as_bytes, count=bits, bitorder='little')
+        return cells.reshape(self.rows, self.width)[:, :self.cols]
+
+    def step(self, state) -> int:
+        """Computes the next generation
+
+        The eight neighbour planes are added into a saturating three bit
+        counter (ones, twos, fours), fours is set when there are four or more.
+
+        Args:
+            state (int): the board
+
+        Returns:
+            int: the board in the next generation
+        """
+        width, board_mask = self.width, self.board_mask
+        west = (state << 1) & self.cells_mask
+        east = (state >> 1) & self.cells_mask
+        planes = (west, east, (state << width) & board_mask, state >> width,
+                  (west << width) & board_mask, west >> width, (east << width) & board_mask, east >> width)
+        ones = twos = fours = 0
+        for plane in planes:
+            carry = ones & plane
+            ones ^= plane
+            fours |= twos & carry
+            twos ^= carry
+        return twos & ~fours & (ones | state)
+
+
+def _clear_border(buffers):
+    """Sets the border cells of padded buffers to 0
+
+    Args:
+        buffers (np.ndarray): array (..., rows + 2, cols + 2)
+    """
+
+    buffers[..., 0, :] = 0
+    buffers[..., -1, :] = 0
+    buffers[..., :, 0] = 0
+    buffers[..., :, -1] = 0
+
+
+def _write_cells(matrix, cells, value):
+    """Writes one value to many cells of a matrix
+
+    Args:
+        matrix (np.ndarray): matrix to change
+        cells (set): (row, col) of the cells
+        value (int): 0 or 1
+    """
+
+    if cells:
+        rows, cols = zip(*cells)
+        matrix[list(rows), list(cols)] = value
+
+
+_ONE = np.uint64(1)
+_LAST_BIT = np.uint64(63)
+
+
+_MIX_SHIFTS = (np.uint64(30), np.uint64(27), np.uint64(31))
+_MIX_FACTORS = (np.uint64(0xbf58476d1ce4e5b9), np.uint64(0x94d049bb133111eb))
+
+
+def _hash_rows(words):
+    """Hashes every row of packed words into one uint64
+
+    The words of a row are folded one after another with the splitmix64
+    finalizer, which is a bijection and not linear in the words, so rows of
+    one word never collide and longer rows collide only by chance.
+
+    Args:
+        words (np.ndarray): array (rows, words) of uint64 made by _pack_rows()
+
+    Returns:
+        np.ndarray: uint64 hash of every row
+    """
+
+    hashes = np.zeros(len(words), dtype=np.uint64)
+    for column in words.T:
+        hashes ^= column
+        hashes ^= hashes >> _MIX_SHIFTS[0]
+        hashes *= _MIX_FACTORS[0]
+        hashes ^= hashes >> _MIX_SHIFTS[1]
+        hashes *= _MIX_FACTORS[1]
+        hashes ^= hashes >> _MIX_SHIFTS[2]
+    return hashes
+
+
+def _pack_rows(matrix):
+    """Packs every row of a 0/1 matrix into uint64 words, 64 cells per word
+
+    Args:
+        matrix (np.ndarray): matrix with values 0 or 1
+
+    Returns:
+        np.ndarray: array of shape (rows, ceil(cols/64)), bit j of word w is column 64*w + j
+    """
+
+    rows, cols = matrix.shape
+    words = (cols + 63) // 64
+    packed = np.zeros((rows, words * 8), dtype=np.uint8)
+    packed[:, :(cols + 7) // 8] = np.packbits(matrix, axis=1, bitorder='little')
+    return packed.view('<u8').astype(np.uint64, copy=False)
+
+
+def _unpack_rows(bits, cols):
+    """Unpacks words created by _pack_rows back to a 0/1 matrix
+
+    Args:
+        bits (np.ndarray): packed rows
+        cols (int): number of columns
+
+    Returns:
+        np.ndarray: matrix of shape (rows, cols)
+    """
+
+    as_bytes = bits.astype('<u8', copy=False).view(np.uint8)
+    return np.unpackbits(as_bytes, axis=1, count=cols, bitorder='little')
+
+
+def _full_adder(a, b, c):
+    """Adds three bit planes
+
+    Returns:
+        tuple: sum and carry bit planes
+    """
+
+    partial = a ^ b
+    return partial ^ c, (a & b) | (partial & c)
+
+
+class PackedBoard(Board):
+
+    """Board which keeps 64 cells of a row in one uint64 word.
+
+    The next generation is computed with bitwise operations on whole words,
+    so one operation handles 64 cells. The matrix property unpacks the
+    board on demand and returns a read-only array.
+    """
+
+    def __init__(self, rows, cols, backend='cpu'):
+
+        """
+        Initialize the board
+
+        :param rows: number of rows
+        :param cols: number od columns
+        :param backend: only 'cpu', the words are always stepped on the CPU
+
+        """
+        if backend != 'cpu':
+            raise ValueError("PackedBoard supports only the 'cpu' backend.")
+        super().__init__(rows, cols, backend)
+
+    @property
+    def matrix(self):
+        """Unpacked board
+
+        Returns:
+            np.ndarray: read-only matrix with values 0 or 1
+        """
+
+        if self._matrix is None:
+            self._matrix = _unpack_rows(self._bits, self.cols)
+            self._matrix.flags.writeable = False
+        return self._matrix
+
+    @matrix.setter
+    def matrix(self, value):
+        value = np.asarray(value)
+        self.rows, self.cols = value.shape
+        self._bits = _pack_rows(value)
+        self._spare_bits = np.empty_like(self._bits)
+        self._matrix = None
+        last = self.cols % 64
+        self._last_mask = np.uint64((1 << last) - 1) if last else ~np.uint64(0)
+
+    def clear(self):
+        """This method clears the board"""
+
+        self.step_count = 0
+        self._bits.fill(0)
+        self._matrix = None
+
+    def empty(self) -> bool:
+        """This method checks whether the board has no alive cells.
+
+        Returns:
+            bool: It is True whether the cells: 0. Otherwise it it False
+        """
+
+        return not self._bits.any()
+
+    def copy(self):
+        """Creates a copy of the board
+
+        Returns:
+            PackedBoard: new board with copied words and step count
+        """
+
+        new_board = self._empty_like(self)
+        np.copyto(new_board._bits, self._bits)
+        return new_board
+
+    @classmethod
+    def _empty_like(cls, board):
+        """Creates a board of the same size without filling its words
+
+        Args:
+            board (PackedBoard): board whose size, backend and step count are used
+
+        Returns:
+            PackedBoard: new board with undefined cells
+        """
+
+        new_board = cls.__new__(cls)
+        new_board.backend = board.backend
+        new_board.rows = board.rows
+        new_board.cols = board.cols
+        new_board.step_count = board.step_count
+        new_board._bits = np.empty_like(board._bits)
+        new_board._spare_bits = np.empty_like(board._bits)
+        new_board._matrix = None
+        new_board._last_mask = board._last_mask
+        return new_board
+
+    def set_cell_value(self, row, col, state):
+        """Sets value of a cell
+
+        Args:
+            row (int): row index
+            col (int): column index
+            state (int): 0 if cell is dead or 1 if cell is alive
+
+        Raises:
+            ValueError: whether state is not 0 or 1
+            IndexError: if cell is outside the board
+        """
+
+        if state not in (0, 1):
+            raise ValueError("W komorce musi byc wartosc 0-1")
+        if not (0 <= row < self.rows) or not (0 <= col < self.cols):
+            raise IndexError("Komorka jest poza plansza")
+        bit = np.uint64(1 << (col % 64))
+        if state:
+            self._bits[row, col // 64] |= bit
+        else:
+            self._bits[row, col // 64] &= ~bit
+        self._matrix = None
+
+    def set_cells(self, cells, state=1):
+        """Sets one value in many cells at once
+
+        Args:
+            cells (list or np.ndarray): (row, col) of every cell
+            state (int): 0 if cells are dead or 1 if cells are alive
+
+        Raises:
+            ValueError: whether state is not 0 or 1 or cells are not (row, col) pairs
+            IndexError: if a cell is outside the board
+        """
+
+        rows, cols = self._cell_indices(cells, state)
+        index = (rows, cols // 64)
+        bits = _ONE << (cols % 64).astype(np.uint64)
+        if state:
+            np.bitwise_or.at(self._bits, index, bits)
+        else:
+            np.bitwise_and.at(self._bits, index, ~bits)
+        self._matrix = None
+
+    def get_cell_value(self, row, col):
+        """Gets value of a cell
+
+        Args:
+            row (int): row index
+            col (int): column index
+
+        Raises:
+            IndexError: if cell is outside the board
+        Returns:
+            int: value of the cell (0 or 1)
+        """
+
+        if not 0 <= row < self.rows or not 0 <= col < self.cols:
+            raise IndexError("Cell is outside the board")
+        return int(self._bits[row, col // 64] >> np.uint64(col % 64)) & 1
+
+    def step(self):
+        """One iteration of game of life
+
+        The eight neighbour planes are added with a carry-save adder, which
+        gives the bits of the neighbour count of 64 cells at once. With Numba
+        the adder runs word by word in a compiled kernel. The next generation
+        is written into a second array of words and the two are swapped.
+        """
+
+        new_bits = self._spare_bits
+        if step_packed_kernel is not None:
+            step_packed_kernel(self._bits, new_bits, self._last_mask)
+        else:
+            self._step_words(new_bits)
+        self._bits, self._spare_bits = new_bits, self._bits
+        self._matrix = None
+        self.step_count += 1
+
+    def step_sparse(self):
+        """One iteration of game of life
+
+        The words already skip the cost of dead cells, so this is step().
+        """
+
+        self.step()
+
+    def _step_words(self, out):
+        """Computes the next generation with NumPy operations on whole arrays of words
+
+        Args:
+            out (np.ndarray): array of the shape of the words for the next generation
+        """
+
+        bits = self._bits
+        up = np.zeros_like(bits)
+        up[1:] = bits[:-1]
+        down = np.zeros_like(bits)
+        down[:-1] = bits[1:]
+
+        ones_a, twos_a = _full_adder(self._west(up), up, self._east(up))
+        ones_b, twos_b = _full_adder(self._west(down), down, self._east(down))
+        west, east = self._west(bits), self._east(bits)
+        ones_c, twos_c = west ^ east, west & east
+        ones, twos_d = _full_adder(ones_a, ones_b, ones_c)
+        twos, fours_a = _full_adder(twos_a, twos_b, twos_c)
+        fours_b = twos & twos_d
+        twos ^= twos_d
+
+        np.bitwise_or(fours_a, fours_b, out=fours_a)
+        np.bitwise_or(ones, bits, out=ones)
+        np.bitwise_and(twos, ones, out=out)
+        out &= ~fours_a
+        out[:, -1] &= self._last_mask
+
+    def step_n(self, steps, frames=None):
+        """Performs many iterations of game of life
+
+        Args:
+            steps (int): number of iterations
+            frames (list): if given, pack() of every new generation is appended to it
+
+        Raises:
+            ValueError: if steps is negative
+        """
+
+        if steps < 0:
+            raise ValueError("Liczba krokow nie moze byc ujemna")
+        for _ in range(steps):
+            self.step()
+            if frames is not None:
+                frames.append(self.pack())
+
+    def is_stable(self, previous_board) -> bool:
+        """Responsible for checking if the board is the same as in a previous state
+
+        Args:
+            previous_board (Board): board in a previous state
+
+        Returns:
+            bool: It is true when boards are the same
+        """
+
+        if isinstance(previous_board, PackedBoard):
+            return np.array_equal(self._bits, previous_board._bits)
+        return super().is_stable(previous_board)
+
+    def state_key(self) -> bytes:
+        """Returns a short digest of the cells, used to find repeated states
+
+        Returns:
+            bytes: 16 byte digest of the packed words
+        """
+
+        return hashlib.blake2b(self._bits.tobytes(), digest_size=16).digest()
+
+    def pack(self) -> np.ndarray:
+        """Packs the cells into bits, 8 cells in one byte
+
+        The bytes are taken straight from the words, without unpacking the
+        board, and every row uses ceil(cols/8) bytes.
+
+        Returns:
+            np.ndarray: 1-D uint8 array, it can be turned back into cells with unpack()
+        """
+
+        as_bytes = self._bits.astype('<u8', copy=False).view(np.uint8)
+        return as_bytes[:, :(self.cols + 7) // 8].flatten()
+
+    def unpack(self, packed) -> np.ndarray:
+        """Turns the result of pack() back into a matrix with the shape of this board
+
+        Args:
+            packed (np.ndarray): result of pack() or many of them stacked along the first axis
+
+        Returns:
+            np.ndarray: matrix (or matrices) with values 0 or 1
+        """
+
+        packed = np.asarray(packed)
+        rows = packed.reshape(packed.shape[:-1] + (self.rows, -1))
+        return np.unpackbits(rows, axis=-1, count=self.cols, bitorder='little')
+
+    def load_packed(self, packed):
+        """Sets all cells from the result of pack() of a board of the same size
+
+        Args:
+            packed (np.ndarray): result of pack()
+        """
+
+        as_bytes = np.zeros((self.rows, self._bits.shape[1] * 8), dtype=np.uint8)
+        as_bytes[:, :(self.cols + 7) // 8] = np.asarray(packed).reshape(self.rows, -1)
+        self._bits = as_bytes.view('<u8').astype(np.uint64, copy=False)
+        self._matrix = None
+
+    @staticmethod
+    def _west(bits):
+        """Moves every cell one column to the right, so each cell sees its west neighbour"""
+
+        shifted = bits << _ONE
+        shifted[:, 1:] |= bits[:, :-1] >> _LAST_BIT
+        return shifted
+
+    @staticmethod
+    def _east(bits):
+        """Moves every cell one column to the left, so each cell sees its east neighbour"""
+
+        shifted = bits >> _ONE
+        shifted[:, :-1] |= bits[:, 1:] << _LAST_BIT
+        return shifted
@@ -1,31 +1,125 @@
+from collections import OrderedDict
+from collections.abc import Mapping
 import numpy as np
-from typing import Set, Tuple
+from .board import PackedBoard
+
+HISTORY_SIZE = 10000
+"""Number of previous states remembered for loop detection"""
+
+STEP_CACHE_SIZE = 4096
+"""Number of transitions between states remembered once a loop is found"""
+
+STEP_CACHE_CELLS = 400 * 400
+"""Fewest cells of a Board for which remembered transitions are faster than steps"""
+
+FRAMES_CAPACITY = 1024
+"""Largest number of frames for which Frames allocates memory up front"""
+
+class SimResult(Mapping):
+
+    """Result of a simulation
+
+    The fields can be read as attributes or by key, like a dict.
+    """
+
+    __slots__ = ('loop', 'step_count', 'board', 'where_is_loop', 'why')
+    _KEYS = __slots__
+
+    def __init__(self, loop, step_count, board, where_is_loop, why):
+        """Initializes the result
+
+        Args:
+            loop (bool): it is True if a loop was found
+            step_count (int): number of steps done
+            board (Board): board after the simulation
+            where_is_loop (int): step in which the loop was found or None
+            why (str): reason of the end: 'loop', 'empty', 'max_number_of_steps' or 'unknown'
+        """
+        self.loop = loop
+        self.step_count = step_count
+        self.board = board
+        self.where_is_loop = where_is_loop
+        self.why = why
+
+    def __getitem__(self, key):
+        """Returns a field by its name
+
+        Raises:
+            KeyError: if there is no such field
+        """
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        """Iterates over the names of the fields, like a dict"""
+        return iter(self._KEYS)
+
+    def __len__(self):
+        """Returns the number of fields"""
+        return len(self._KEYS)
+
+    def __repr__(self):
+        """Returns the fields in the form SimResult(loop=..., ...)"""
+        fields = ', '.join(f"{key}={getattr(self, key)!r}" for key in self._KEYS)
+        return f"{type(self).__name__}({fields})"
+
+class VideoResult(SimResult):
+
+    """Result of a recorded simulation, it also has the frames
+    """
+
+    __slots__ = ('frames',)
+    _KEYS = ('frames',) + SimResult._KEYS
+
+    def __init__(self, frames, loop, step_count, board, where_is_loop, why):
+        """Initializes the result
+
+        Args:
+            frames (Frames): recorded frames
+            loop (bool): it is True if a loop was found
+            step_count (int): number of steps done
+            board (Board): board after the simulation
+            where_is_loop (int): step in which the loop was found or None
+            why (str): reason of the end
+        """
+        super().__init__(loop, step_count, board, where_is_loop, why)
+        self.frames = frames
 
 class Simulation:
     """Class which is responsible for managing the simulation
     """
 
-    def __init__(self, board, max_number_of_steps: int = 1000, stop_simulation: bool = True):
+    def __init__(self, board, max_number_of_steps: int = 1000, stop_simulation: bool = True,
+                 cycle_detection: str = 'history'):
         """Initialize simulation
 
         Args:
             board (Board): board
             max_number_of_steps (int): maximum number of steps
             stop_simulation (bool): stop simulation when loop is detected
+            cycle_detection (str): 'history' remembers previous states and finds a loop as soon as a state repeats,
+                'brent' keeps only one saved board (Brent's algorithm) and may find the loop up to two periods later
 
         Raises:
             ValueError: if max_number_of_steps is not a positive number
+            ValueError: if cycle_detection is unknown
         """
 
         if max_number_of_steps <= 0:
             raise ValueError("Maksymalna liczba krokow powinna byc liczba dodatnia")
+        if cycle_detection not in ('history', 'brent'):
+            raise ValueError("Nieznana metoda wykrywania petli")
         self.board = board
         self.stop_simulation = stop_simulation
         self.max_number_of_steps = max_number_of_steps
+        self.cycle_detection = cycle_detection
         self.loop = False
         self.where_is_loop= None
-        self.previous_boards: Set[Tuple[Tuple[int,...],...]] = set()
-        self.previous_boards.add(self.board.change_to_tuple())
+        self.loop_length = None
+        self.previous_boards: OrderedDict[bytes, int] = OrderedDict()
+        self._step_cache: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._remember_first_state()
 
     def is_loop(self):
         """Responsible for checking if there is a loop
@@ -44,21 +138,19 @@ class Simulation:
             bool: it is true if simulation continues
         """
 
-        self.board.step()
+        if self.loop_length is not None and self._caches_steps():
+            self._cached_step()
+        else:
+            self.board.step()
         if self.board.step_count >= self.max_number_of_steps:
             return False
-        current_board_state = self.board.change_to_tuple()
-        if current_board_state in self.previous_boards:
+        if self._is_repeated():
             self.loop = True
             self.where_is_loop = self.board.step_count
             if self.stop_simulation:
                 
                 return False
                    
-        self.previous_boards.add(current_board_state)
-        if len(self.previous_boards) > 10000:
-            self.previous_boards.clear()
-            self.previous_boards.add(current_board_state)
         if self.board.empty():
             self.loop = True
             self.where_is_loop = self.board.step_count
@@ -67,20 +159,96 @@ class Simulation:
 
         return True
     
+    def _caches_steps(self) -> bool:
+        """Checks whether remembered transitions are faster than steps of this board
+
+        Loading a remembered state costs a key, an unpack and a copy, which
+        pays off on a PackedBoard and on a Board of STEP_CACHE_CELLS cells.
+
+        Returns:
+            bool: it is True if _cached_step() should be used once a loop is found
+        """
+
+        return isinstance(self.board, PackedBoard) or self.board.rows * self.board.cols >= STEP_CACHE_CELLS
+
+    def _cached_step(self):
+        """Performs one step after a loop was found, using remembered transitions
+
+        In a loop the same states come back, so the next state of every
+        state is remembered packed and later written to the board instead of
+        being computed. Before a loop is found no state repeats, so nothing is
+        remembered then. The key is taken from the board on every call, so
+        cells changed between steps are never mistaken for the cached state.
+        """
+
+        key = self.board.state_key()
+        packed = self._step_cache.get(key)
+        if packed is None:
+            self.board.step()
+            self._step_cache[key] = self.board.pack()
+            if len(self._step_cache) > STEP_CACHE_SIZE:
+                self._step_cache.popitem(last=False)
+        else:
+            self._step_cache.move_to_end(key)
+            self.board.load_packed(packed)
+            self.board.step_count += 1
+
+    def _remember_first_state(self):
+        """Starts loop detection from the current state of the board
+        """
+
+        if self.cycle_detection == 'brent':
+            self._saved_board = self.board.copy()
+            self._power = 1
+            self._distance = 0
+        else:
+            self.previous_boards[self.board.state_key()] = self.board.step_count
+
+    def _is_repeated(self) -> bool:
+        """Checks whether the current state appeared before and remembers it
+
+        When it did, loop_length is set to the number of steps between the
+        two occurrences. The game is deterministic, so once a loop is found
+        every next state is repeated too and nothing more is hashed or
+        remembered, which matters when stop_simulation is False.
+
+        Returns:
+            bool: it is True if the state is repeated
+        """
+
+        if self.loop_length is not None:
+            return True
+        if self.cycle_detection == 'brent':
+            if self.board.is_stable(self._saved_board):
+                self.loop_length = self._distance + 1
+                return True
+            self._distance += 1
+            if self._distance == self._power:
+                self._saved_board = self.board.copy()
+                self._power *= 2
+                self._distance = 0
+            return False
+        current_board_state = self.board.state_key()
+        first_step = self.previous_boards.get(current_board_state)
+        if first_step is not None:
+            self.loop_length = self.board.step_count - first_step
+            return True
+        self.previous_boards[current_board_state] = self.board.step_count
+        if len(self.previous_boards) > HISTORY_SIZE:
+            self.previous_boards.popitem(last=False)
+        return False
+
     def start_simulation(self):
         """Runs the simulation
+
+        Returns:
+            SimResult: loop, step_count, board, where_is_loop, why
         """
 
         if self.board.empty():
             self.loop = True
             self.where_is_loop = self.board.step_count
-            return{
-                'loop': False,
-                'step_count': self.board.step_count,
-                'board': self.board,
-                'where_is_loop': None,
-                'why': 'empty'
-            }
+            return SimResult(False, self.board.step_count, self.board, None, 'empty')
         while True:
             continue_simulation = self.simulation_step()
             if not continue_simulation:
@@ -91,23 +259,19 @@ class Simulation:
             why = 'loop'
         else:
             why = 'unknown'
-        return{
-            'loop': self.loop,
-            'step_count': self.board.step_count,
-            'board': self.board,
-            'where_is_loop': self.where_is_loop,
-            'why': why
-        }
+        return SimResult(self.loop, self.board.step_count, self.board, self.where_is_loop, why)
     
     def reset_simulation(self):
         """Resets the simulation
         """
 
         self.previous_boards.clear()
+        self._step_cache.clear()
         self.loop = False
         self.where_is_loop = None
+        self.loop_length = None
         self.board.step_count = 0
-        self.previous_boards.add(self.board.change_to_tuple())
+        self._remember_first_state()
 
     def copy_current_board(self):
         """Returns a copy of a board
@@ -117,6 +281,77 @@ class Simulation:
         """
         return np.copy(self.board.matrix)
 
+class Frames:
+
+    """Frames recorded by Video
+
+    Every frame is kept bit-packed, one bit per cell, in one preallocated
+    array with a row per frame, and is unpacked to a matrix only when it is
+    read. The array grows twice when it is full.
+    """
+
+    def __init__(self, board, capacity=FRAMES_CAPACITY):
+        """Initializes empty frames
+
+        Args:
+            board (Board): board which is recorded, it packs and unpacks the frames
+            capacity (int): expected number of frames, at most FRAMES_CAPACITY rows are allocated up front
+        """
+        self.board = board
+        frame_size = board.pack().size
+        self._packed = np.empty((max(min(capacity, FRAMES_CAPACITY), 1), frame_size), dtype=np.uint8)
+        self._count = 0
+
+    def append(self, packed):
+        """Adds a frame
+
+        Args:
+            packed (np.ndarray): state returned by board.pack()
+        """
+        if self._count == len(self._packed):
+            grown = np.empty((2 * len(self._packed), self._packed.shape[1]), dtype=np.uint8)
+            grown[:self._count] = self._packed
+            self._packed = grown
+        self._packed[self._count] = packed
+        self._count += 1
+
+    def extend(self, frames):
+        """Adds many frames
+
+        Args:
+            frames (iterable): states returned by board.pack()
+        """
+        for packed in frames:
+            self.append(packed)
+
+    def __len__(self):
+        """Returns the number of frames"""
+        return self._count
+
+    def __getitem__(self, index):
+        """Returns a frame unpacked to a matrix
+
+        Args:
+            index (int or slice): frame number, a slice gives an array of frames
+
+        Returns:
+            np.ndarray: frame
+        """
+        return self.board.unpack(self._packed[:self._count][index])
+
+    def __iter__(self):
+        """Iterates over unpacked frames"""
+        for packed in self._packed[:self._count]:
+            yield self.board.unpack(packed)
+
+    def to_array(self):
+        """Unpacks all frames at once
+
+        Returns:
+            np.ndarray: array of shape (number of frames, rows, cols)
+        """
+        return self.board.unpack(self._packed[:self._count])
+
 class Video:
     
     """Class which is responsible for recording frames
@@ -129,7 +364,8 @@ class Video:
             simulation (Simulation): simulation to record
         """
         self.simulation = simulation
-        self.frames = [self.simulation.copy_current_board()]
+        self.frames = Frames(simulation.board, simulation.max_number_of_steps + 1)
+        self.frames.append(simulation.board.pack())
     
     def record(self):
         """Records state after one step in the simulation
@@ -138,14 +374,14 @@ class Video:
             bool: it is true if simulation continues
         """
         continue_simulation = self.simulation.simulation_step()
-        self.frames.append(self.simulation.copy_current_board())
+        self.frames.append(self.simulation.board.pack())
         return continue_simulation
 
     def video_run(self):
         """Records all frames
 
         Returns:
-            dict: frames, loop, step_count, where_is_loop, board, why
+            VideoResult: frames, loop, step_count, where_is_loop, board, why
         """
         while True:
             continue_simulation = self.record()
@@ -157,14 +393,8 @@ class Video:
             why = 'max_number_of_steps'
         else:
             why = 'unknown'
-        return {
-            'frames': self.frames,
-            'loop': self.simulation.is_loop(),
-            'step_count': self.simulation.board.step_count,
-            'where_is_loop': self.simulation.where_is_loop,
-            'board': self.simulation.board,
-            'why': why
-        }
+        return VideoResult(self.frames, self.simulation.is_loop(), self.simulation.board.step_count,
+                           self.simulation.board, self.simulation.where_is_loop, why)
         
     def get_number_of_frames(self):
         """Returnes the number of frames that were recorded
@@ -2,7 +2,7 @@ import argparse
 import sys
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
-from game_of_life.board import Board
+from game_of_life.board import Board, PackedBoard
 from game_of_life.simulation import Simulation, Video
 
 def main():
@@ -10,11 +10,12 @@ def main():
     parser.add_argument('config_file', help='Ścieżka do pliku konfiguracyjnego (układ planszy)')
     parser.add_argument('--fps', type=int, default=10, help='Klatki na sekundę dla animacji (domyślnie 10)')
     parser.add_argument('--max-steps', type=int, default=500, help='Maksymalna liczba kroków symulacji (domyślnie 500)')
+    parser.add_argument('--packed', action='store_true', help='Plansza upakowana bitowo, 64 komórki w jednym słowie')
 
     args = parser.parse_args()
 
     try:
-        board = Board(1, 1)
+        board = PackedBoard(1, 1) if args.packed else Board(1, 1)
         board.load_board_from_file(args.config_file)
     except Exception as e:
         print(f"Błąd ładowania pliku konfiguracyjnego: {e}")
@@ -25,20 +26,21 @@ def main():
     result = video.video_run()
 
     fig, ax = plt.subplots()
-    ax.set_xlim(0, board.cols)
-    ax.set_ylim(0, board.rows)
     ax.set_aspect('equal')
     ax.axis('off')
 
-    frames_data = result['frames']
+    frames_data = result['frames'].to_array()
+    image = ax.imshow(frames_data[0], cmap='binary', origin='upper', vmin=0, vmax=1)
+    # blit redraws only the inside of the axes, so the step number is drawn there and not as the title
+    step_text = ax.text(0.02, 0.98, 'Krok 0', transform=ax.transAxes, ha='left', va='top',
+                        color='tab:red', bbox=dict(facecolor='white', alpha=0.8, edgecolor='none'))
 
     def animate(i):
-        ax.clear()
-        ax.imshow(frames_data[i], cmap='binary', origin='upper')
-        ax.set_title(f'Krok {i}')
-        ax.axis('off')
+        image.set_data(frames_data[i])
+        step_text.set_text(f'Krok {i}')
+        return image, step_text
 
-    ani = animation.FuncAnimation(fig, animate, frames=len(frames_data), interval=1000/args.fps, repeat=False)
+    ani = animation.FuncAnimation(fig, animate, frames=len(frames_data), interval=1000/args.fps, repeat=False, blit=True)
 
     try:
         ani.save('simulation.gif', writer='pillow', fps=args.fps)
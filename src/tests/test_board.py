@@ -1,4 +1,5 @@
 import unittest
+from unittest import mock
 import numpy as np
 import os
 import sys
@@ -6,7 +7,9 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from game_of_life.board import Board
+from game_of_life import board as board_module
+from game_of_life.board import Board, PackedBoard
+from game_of_life._kernels import cuda, step_kernel, step_packed_kernel
 
 
 class TestBoard(unittest.TestCase):
@@ -27,9 +30,36 @@ class TestBoard(unittest.TestCase):
 
         self.assertEqual(self.board.rows, 6)
         self.assertEqual(self.board.cols, 6)
-        self.assertTrue(np.all(self.board.matrix == 0))
+        self.assertFalse(self.board.matrix.any())
+        self.assertEqual(self.board.matrix.dtype, np.uint8)
         self.assertEqual(self.board.step_count, 0)
 
+    def test_wrong_backend(self):
+
+        """Test creating a board with an unknown backend
+        """
+
+        with self.assertRaises(ValueError):
+            Board(6, 6, backend='tpu')
+
+    @unittest.skipUnless(cuda is not None and cuda.is_available(), "CUDA is not available")
+    def test_cuda_backend(self):
+
+        """Test if the GPU gives the same generations as the CPU
+        """
+
+        board = Board(20, 23, backend='cuda')
+        board.random_board(density=0.4)
+        expected = Board.from_tuple(board.change_to_tuple())
+        frames = []
+        board.step_n(3, frames)
+        board.step()
+        for _ in range(4):
+            expected.matrix = expected._step_numpy()
+        self.assertTrue(np.array_equal(board.matrix, expected.matrix))
+        self.assertEqual(len(frames), 3)
+        self.assertEqual(board.step_count, 4)
+
     def test_random_board(self):
         
         """Test filling the board with random values
@@ -38,6 +68,11 @@ class TestBoard(unittest.TestCase):
         self.board.random_board(density=0.5)
         self.assertEqual(self.board.step_count, 0)
         self.assertTrue(np.any(self.board.matrix == 1))
+        self.assertEqual(self.board.matrix.dtype, np.uint8)
+        self.board.random_board(density=0)
+        self.assertFalse(self.board.matrix.any())
+        self.board.random_board(density=1)
+        self.assertTrue(self.board.matrix.all())
 
     def test_clear(self):
 
@@ -46,7 +81,7 @@ class TestBoard(unittest.TestCase):
 
         self.board.random_board()
         self.board.clear()
-        self.assertTrue(np.all(self.board.matrix == 0))
+        self.assertFalse(self.board.matrix.any())
         self.assertEqual(self.board.step_count, 0)
 
     def test_cell_value(self):
@@ -62,6 +97,29 @@ class TestBoard(unittest.TestCase):
         with self.assertRaises(IndexError):
             self.board.set_cell_value(10, 10, 1)
 
+    def test_set_cells(self):
+
+        """Test setting many cells at once
+        """
+
+        self.board.set_cells([(0, 1), (2, 3), (2, 3), (5, 5)])
+        self.assertEqual(int(self.board.matrix.sum()), 3)
+        self.assertEqual(self.board.get_cell_value(5, 5), 1)
+        self.board.set_cells(np.array([[2, 3]]), 0)
+        self.assertEqual(self.board.get_cell_value(2, 3), 0)
+        self.board.set_cells([])
+        self.assertEqual(self.board.state_key(), Board.from_tuple(self.board.change_to_tuple()).state_key())
+        with self.assertRaises(ValueError):
+            self.board.set_cells([(0, 0)], 2)
+        with self.assertRaises(IndexError):
+            self.board.set_cells([(0, 0), (0, 6)])
+        self.assertEqual(self.board.get_cell_value(0, 0), 0)
+        self.board.set_cells(np.empty((0, 2), dtype=int))
+        for cells in ([1, 2, 3, 4], [(0, 1, 2)], (2, 3), np.zeros((2, 2, 2), dtype=int)):
+            with self.assertRaises(ValueError):
+                self.board.set_cells(cells)
+        self.assertEqual(int(self.board.matrix.sum()), 2)
+
     def test_count_alive_neighbours(self):
 
         """A test to count how many cell neighbours are alive
@@ -71,6 +129,8 @@ class TestBoard(unittest.TestCase):
         self.board.set_cell_value(1, 2, 1)
         self.assertEqual(self.board.count_alive(1, 1), 1)
         self.assertEqual(self.board.count_alive(0, 0), 1)
+        self.assertEqual(self.board.count_alive(0, 3), 1)
+        self.assertEqual(self.board.count_alive(5, 5), 0)
 
     def test_copy(self):
 
@@ -81,6 +141,10 @@ class TestBoard(unittest.TestCase):
         next_board = self.board.copy()
         self.assertTrue(np.array_equal(next_board.matrix, self.board.matrix))
         self.assertEqual(next_board.step_count, self.board.step_count)
+        self.assertEqual(next_board.state_key(), self.board.state_key())
+        next_board.set_cell_value(0, 0, 0)
+        self.assertEqual(self.board.get_cell_value(0, 0), 1)
+        self.assertNotEqual(next_board.state_key(), self.board.state_key())
 
     def test_file(self):
 
@@ -95,6 +159,33 @@ class TestBoard(unittest.TestCase):
         self.assertTrue(np.array_equal(self.board.matrix, loaded_board.matrix))
         os.remove(filename)
 
+    def test_dtype(self):
+
+        """Test if every way of creating or changing a board keeps uint8 cells
+        """
+
+        filename = "test_dtype.txt"
+        with open(filename, 'w') as file:
+            file.write("010\n111\n")
+        loaded_board = Board(1, 1)
+        loaded_board.load_board_from_file(filename)
+        os.remove(filename)
+        boards = [loaded_board, Board.from_tuple(((0, 1), (1, 1))), PackedBoard.from_tuple(((0, 1), (1, 1)))]
+        self.board.matrix = np.ones((6, 6), dtype=np.int64)
+        boards.append(self.board)
+        for board in boards:
+            self.assertEqual(board.matrix.dtype, np.uint8)
+            board.step()
+            self.assertEqual(board.matrix.dtype, np.uint8)
+            frames = []
+            board.step_n(2, frames)
+            self.assertEqual(board.matrix.dtype, np.uint8)
+            self.assertEqual(board.unpack(frames[-1]).dtype, np.uint8)
+        big = Board(100, 100)
+        big.random_board(density=0.4)
+        big.step_n(2)
+        self.assertEqual(big.matrix.dtype, np.uint8)
+
     def test_step(self):
 
         """Test if step() works correctly
@@ -109,6 +200,153 @@ class TestBoard(unittest.TestCase):
         self.assertEqual(self.board.get_cell_value(2, 1), 1)
         self.assertEqual(self.board.step_count, 1)
 
+    def test_step_random_board(self):
+
+        """Test if step() follows the rules for every cell of a random board
+        """
+
+        self.board.random_board(density=0.4)
+        expected = np.zeros_like(self.board.matrix)
+        for row in range(self.board.rows):
+            for col in range(self.board.cols):
+                alive = self.board.count_alive(row, col)
+                if alive == 3 or (alive == 2 and self.board.matrix[row, col] == 1):
+                    expected[row, col] = 1
+        self.board.step()
+        self.assertTrue(np.array_equal(self.board.matrix, expected))
+
+    def test_step_n(self):
+
+        """Test if step_n() gives the same generations as calling step()
+        """
+
+        board = Board(40, 9)
+        board.random_board(density=0.4)
+        expected = board.copy()
+        frames = []
+        board.step_n(7, frames)
+        self.assertEqual(len(frames), 7)
+        for frame in frames:
+            expected.step()
+            self.assertTrue(np.array_equal(np.unpackbits(frame)[:40 * 9].reshape(40, 9), expected.matrix))
+        self.assertTrue(np.array_equal(board.matrix, expected.matrix))
+        self.assertEqual(board.step_count, 7)
+        with self.assertRaises(ValueError):
+            board.step_n(-1)
+
+    def test_step_n_bands(self):
+
+        """Test if step_n() gives the same generations as step() when the board is split into bands
+        """
+
+        for band_bytes in (32 * 32, 8 * 32, 1):
+            board = Board(100, 30)
+            board.random_board(density=0.4)
+            expected = board.copy()
+            frames = []
+            with mock.patch.object(board_module, 'BAND_BYTES', band_bytes):
+                board.step_n(20, frames)
+            self.assertEqual(len(frames), 20)
+            for frame in frames:
+                expected.step()
+                self.assertTrue(np.array_equal(board.unpack(frame), expected.matrix))
+            self.assertTrue(np.array_equal(board.matrix, expected.matrix))
+            self.assertEqual(board.step_count, 20)
+
+    def test_step_n_tile(self):
+
+        """Test if step_n() on a board kept in one int gives the same generations as step()
+        """
+
+        for board in (Board(6, 6), Board(40, 9)):
+            board.random_board(density=0.4)
+            board.set_cells([(0, 0), (0, 1), (1, 0)])
+            expected = board.copy()
+            frames = []
+            with mock.patch.object(board_module, 'TILE_BITS', board.rows * (board.cols + 1)):
+                board.step_n(5, frames)
+            for frame in frames:
+                expected.step()
+                self.assertTrue(np.array_equal(board.unpack(frame), expected.matrix))
+            self.assertTrue(np.array_equal(board.matrix, expected.matrix))
+            self.assertEqual(board.state_key(), expected.state_key())
+            self.assertEqual(board.step_count, 5)
+
+    def test_step_sparse(self):
+
+        """Test if step_sparse() gives the same generations as the dense step
+        """
+
+        for row, col in ((0, 1), (1, 2), (2, 0), (2, 1), (2, 2)):
+            self.board.set_cell_value(row, col, 1)
+        dense = self.board.copy()
+        for _ in range(8):
+            self.board.step_sparse()
+            dense.matrix = dense._step_numpy()
+            self.assertTrue(np.array_equal(self.board.matrix, dense.matrix))
+        self.board.set_cell_value(0, 0, 1)
+        dense.set_cell_value(0, 0, 1)
+        self.board.step_sparse()
+        dense.matrix = dense._step_numpy()
+        self.assertTrue(np.array_equal(self.board.matrix, dense.matrix))
+        self.assertEqual(self.board.step_count, 9)
+
+    def test_sparse_matrix_writes(self):
+
+        """Test if cells written straight to the matrix are seen by the sparse step
+        """
+
+        board = Board(300, 300)
+        board.set_cells([(10, 10), (10, 11), (11, 10), (11, 11)])
+        board.step()
+        board.matrix[100, 100:103] = 1
+        for _ in range(3):
+            expected = board._step_numpy()
+            board.step()
+            self.assertTrue(np.array_equal(board.matrix, expected))
+        self.assertEqual(board.get_cell_value(99, 101), 1)
+
+    def test_step_numpy_bands(self):
+
+        """Test if the NumPy step gives the same result when the board is split into bands
+        """
+
+        board = Board(50, 4)
+        board.random_board(density=0.4)
+        whole = board._step_numpy()
+        with mock.patch.object(board_module, 'NUMPY_BAND_BYTES', 1):
+            self.assertTrue(np.array_equal(board._step_numpy(), whole))
+
+    @unittest.skipIf(step_kernel is None, "Numba is not installed")
+    def test_step_kernel(self):
+
+        """Test if the compiled kernel agrees with the NumPy step
+        """
+
+        self.board.random_board(density=0.4)
+        expected = self.board._step_numpy()
+        out = np.empty_like(self.board.matrix)
+        step_kernel(np.pad(self.board.matrix, 1), out)
+        self.assertTrue(np.array_equal(out, expected))
+
+    def test_double_buffer(self):
+
+        """Test if steps reuse the two buffers of the board
+        """
+
+        self.board.random_board(density=0.4)
+        buffers = self.board._buffers
+        for _ in range(3):
+            self.board.step()
+            self.assertIs(self.board._buffers, buffers)
+            self.assertTrue(np.shares_memory(self.board.matrix, buffers))
+        self.assertFalse(buffers[:, 0].any() or buffers[:, -1].any())
+        self.assertFalse(buffers[:, :, 0].any() or buffers[:, :, -1].any())
+        matrix = np.zeros((6, 6), dtype=np.uint8)
+        self.board.matrix = matrix
+        matrix[0, 0] = 1
+        self.assertEqual(self.board.get_cell_value(0, 0), 0)
+
     def test_is_stable(self):
 
         """Test comparing the board with the previous one
@@ -131,6 +369,14 @@ class TestBoard(unittest.TestCase):
         self.assertTrue(self.board.empty())
         self.board.set_cell_value(0, 0, 1)
         self.assertFalse(self.board.empty())
+        self.board.step_sparse()
+        self.assertTrue(self.board.empty())
+        self.board.matrix[5, 5] = 1
+        self.assertFalse(self.board.empty())
+        self.board.set_cell_value(1, 1, 1)
+        self.assertFalse(self.board.empty())
+        self.board.clear()
+        self.assertTrue(self.board.empty())
 
     def test_str(self):
 
@@ -143,6 +389,20 @@ class TestBoard(unittest.TestCase):
         self.assertIn(" ", board_str)
         self.assertIn("*", board_str)
 
+    def test_text_layout(self):
+
+        """Test the exact text written by __str__() and save_board_to_file()
+        """
+
+        board = Board(2, 3)
+        board.set_cell_value(0, 1, 1)
+        self.assertEqual(str(board), "Krok: 0\n * \n   \n")
+        filename = "layout_board.txt"
+        board.save_board_to_file(filename)
+        with open(filename) as file:
+            self.assertEqual(file.read(), "010\n000\n")
+        os.remove(filename)
+
     def test_change_to_from_tuple(self):
 
         """Test changing a board to a tuple
@@ -151,10 +411,84 @@ class TestBoard(unittest.TestCase):
         self.board.set_cell_value(0, 0, 1)
         tup = self.board.change_to_tuple()
         next_board = Board.from_tuple(tup)
+        self.assertEqual(next_board.matrix.dtype, np.uint8)
         self.assertTrue(np.array_equal(self.board.matrix, next_board.matrix))
         self.assertEqual(self.board.rows, next_board.rows)
         self.assertEqual(self.board.cols, next_board.cols)
 
+    def test_state_key(self):
+
+        """Test if equal boards have equal keys and different boards different keys
+        """
+
+        self.board.set_cell_value(0, 0, 1)
+        key = self.board.state_key()
+        self.assertEqual(key, self.board.copy().state_key())
+        self.board.set_cell_value(0, 1, 1)
+        self.assertNotEqual(key, self.board.state_key())
+        wide = Board(2, 130)
+        keys = {wide.state_key()}
+        for row, col in ((0, 0), (0, 64), (1, 129), (1, 128)):
+            wide.set_cell_value(row, col, 1)
+            keys.add(wide.state_key())
+        wide.matrix = wide.matrix[::-1]
+        keys.add(wide.state_key())
+        self.assertEqual(len(keys), 6)
+        top_bits = Board(1, 128)
+        top_bits.set_cells([(0, 63), (0, 127)])
+        self.assertNotEqual(top_bits.state_key(), Board(1, 128).state_key())
+
+    def test_state_key_after_steps(self):
+
+        """Test if keys updated row by row match keys of a new board with the same cells
+        """
+
+        self.board.random_board(density=0.4)
+        for _ in range(6):
+            key = self.board.state_key()
+            self.assertEqual(key, Board.from_tuple(self.board.change_to_tuple()).state_key())
+            self.board.step()
+        self.board.clear()
+        self.assertEqual(self.board.state_key(), Board(6, 6).state_key())
+
+    def test_state_key_matrix_writes(self):
+
+        """Test if the key follows cells written straight into the matrix
+        """
+
+        self.board.random_board(density=0.4)
+        key = self.board.state_key()
+        self.board.matrix[2, 3] ^= 1
+        self.assertNotEqual(self.board.state_key(), key)
+        self.assertEqual(self.board.state_key(), Board.from_tuple(self.board.change_to_tuple()).state_key())
+        self.board.matrix[2, 3] ^= 1
+        self.assertEqual(self.board.state_key(), key)
+
+    def test_state_key_rows(self):
+
+        """Test the keys of boards hashed row by row
+        """
+
+        with mock.patch.object(board_module, 'ROW_HASH_CELLS', 0):
+            for test in (self.test_state_key, self.test_state_key_after_steps,
+                         self.test_state_key_matrix_writes, self.test_load_packed):
+                self.setUp()
+                test()
+
+    def test_load_packed(self):
+
+        """Test if load_packed() restores the cells saved by pack()
+        """
+
+        self.board.random_board(density=0.4)
+        expected = self.board.copy()
+        packed = self.board.pack()
+        key = self.board.state_key()
+        self.board.step()
+        self.board.load_packed(packed)
+        self.assertTrue(np.array_equal(self.board.matrix, expected.matrix))
+        self.assertEqual(self.board.state_key(), key)
+
     def test_wrong_file_format(self):
 
         """Test with loading an incorrect file
@@ -168,6 +502,200 @@ class TestBoard(unittest.TestCase):
             board.load_board_from_file(filename)
         os.remove(filename)
 
+    def test_file_symbols(self):
+
+        """Test loading a file with Windows line endings and with symbols below '0'
+        """
+
+        filename = "symbols_file.txt"
+        with open(filename, 'wb') as file:
+            file.write(b"010\r\n001\r\n")
+        board = Board(1, 1)
+        board.state_key()
+        board.load_board_from_file(filename)
+        self.assertEqual((board.rows, board.cols), (2, 3))
+        board.set_cell_value(1, 0, 1)
+        self.assertEqual(board.state_key(), Board.from_tuple(board.change_to_tuple()).state_key())
+        board.set_cell_value(1, 0, 0)
+        self.assertTrue(np.array_equal(board.matrix, [[0, 1, 0], [0, 0, 1]]))
+        with open(filename, 'w') as file:
+            file.write("0/0\n000\n")
+        with self.assertRaises(ValueError):
+            board.load_board_from_file(filename)
+        os.remove(filename)
+
+
+class TestPackedBoard(unittest.TestCase):
+
+    """Class containing tests for the bit-packed board
+    """
+
+    def setUp(self):
+
+        """Before each test setUp creates a board wider than one word
+        """
+        self.board = PackedBoard(6, 70)
+
+    def test_cell_value(self):
+
+        """Test setting values in cells on both sides of a word boundary
+        """
+
+        self.board.set_cell_value(2, 63, 1)
+        self.board.set_cell_value(2, 64, 1)
+        self.assertEqual(self.board.get_cell_value(2, 63), 1)
+        self.assertEqual(self.board.get_cell_value(2, 64), 1)
+        self.assertEqual(self.board.matrix[2, 63], 1)
+        self.board.set_cell_value(2, 63, 0)
+        self.assertEqual(self.board.get_cell_value(2, 63), 0)
+        self.assertEqual(self.board.count_alive(2, 63), 1)
+        with self.assertRaises(ValueError):
+            self.board.set_cell_value(0, 0, 2)
+        with self.assertRaises(IndexError):
+            self.board.set_cell_value(0, 70, 1)
+
+    def test_backend(self):
+
+        """Test if only the 'cpu' backend is accepted
+        """
+
+        for backend in ('cuda', 'tpu'):
+            with self.assertRaises(ValueError):
+                PackedBoard(6, 6, backend=backend)
+        self.assertEqual(PackedBoard(6, 6).copy().backend, 'cpu')
+
+    def test_step_sparse(self):
+
+        """Test if step_sparse() steps the words like step()
+        """
+
+        self.board.set_cells([(1, 62), (1, 63), (1, 64)])
+        expected = Board.from_tuple(self.board.change_to_tuple())
+        self.board.step_sparse()
+        expected.step_sparse()
+        self.assertTrue(np.array_equal(self.board.matrix, expected.matrix))
+        self.assertEqual(self.board.step_count, 1)
+
+    def test_set_cells(self):
+
+        """Test setting many cells at once on both sides of a word boundary
+        """
+
+        cells = [(1, 0), (1, 63), (1, 64), (1, 64), (5, 69)]
+        self.board.set_cells(cells)
+        board = Board(self.board.rows, self.board.cols)
+        board.set_cells(cells)
+        self.assertTrue(np.array_equal(self.board.matrix, board.matrix))
+        self.board.set_cells([(1, 63), (1, 64)], 0)
+        self.assertEqual(self.board.get_cell_value(1, 63), 0)
+        self.assertEqual(self.board.get_cell_value(1, 64), 0)
+        self.assertEqual(self.board.get_cell_value(1, 0), 1)
+        with self.assertRaises(IndexError):
+            self.board.set_cells([(6, 0)])
+
+    def test_step_matches_board(self):
+
+        """Test if step() gives the same generations as Board
+        """
+
+        board = Board(self.board.rows, self.board.cols)
+        board.random_board(density=0.4)
+        packed = PackedBoard.from_tuple(board.change_to_tuple())
+        for _ in range(5):
+            board.step()
+            packed.step()
+            self.assertTrue(np.array_equal(packed.matrix, board.matrix))
+        self.assertEqual(packed.step_count, 5)
+
+    def test_double_buffer(self):
+
+        """Test if steps swap two arrays of words instead of allocating new ones
+        """
+
+        self.board.set_cells([(2, 62), (2, 63), (2, 64)])
+        first, second = self.board._bits, self.board._spare_bits
+        copy = self.board.copy()
+        self.board.step()
+        self.assertIs(self.board._bits, second)
+        self.board.step()
+        self.assertIs(self.board._bits, first)
+        self.assertTrue(self.board.is_stable(copy))
+        copy.step()
+        self.assertFalse(self.board.is_stable(copy))
+
+    @unittest.skipIf(step_packed_kernel is None, "Numba is not installed")
+    def test_step_packed_kernel(self):
+
+        """Test if the compiled kernel agrees with the NumPy word step
+        """
+
+        for cols in (6, 64, 70, 130):
+            board = PackedBoard(7, cols)
+            board.random_board(density=0.4)
+            out = np.empty_like(board._bits)
+            step_packed_kernel(board._bits, out, board._last_mask)
+            words = np.empty_like(board._bits)
+            board._step_words(words)
+            self.assertTrue(np.array_equal(out, words))
+
+    def test_blinker(self):
+
+        """Test a blinker crossing the word boundary
+        """
+
+        for col in (63, 64, 65):
+            self.board.set_cell_value(1, col, 1)
+        original = self.board.copy()
+        self.board.step()
+        self.assertEqual(self.board.get_cell_value(0, 64), 1)
+        self.assertEqual(self.board.get_cell_value(2, 64), 1)
+        self.assertFalse(self.board.is_stable(original))
+        self.board.step()
+        self.assertTrue(self.board.is_stable(original))
+
+    def test_clear(self):
+
+        """Test clearing the board
+        """
+
+        self.board.random_board()
+        self.board.clear()
+        self.assertTrue(self.board.empty())
+        self.assertEqual(self.board.step_count, 0)
+
+    def test_copy(self):
+
+        """Test if copy() gives an independent board of the same class
+        """
+
+        self.board.random_board(density=0.4)
+        self.board.step()
+        copied = self.board.copy()
+        self.assertIsInstance(copied, PackedBoard)
+        self.assertTrue(np.array_equal(copied.matrix, self.board.matrix))
+        self.assertEqual(copied.step_count, 1)
+        copied.step()
+        self.board.step()
+        self.assertTrue(copied.is_stable(self.board))
+        copied.clear()
+        self.assertFalse(copied.is_stable(self.board))
+
+    def test_pack(self):
+
+        """Test if pack() uses one bit per cell and unpack() restores the cells
+        """
+
+        self.board.random_board(density=0.4)
+        packed = self.board.pack()
+        self.assertEqual(packed.nbytes, 6 * 9)
+        self.assertTrue(np.array_equal(self.board.unpack(packed), self.board.matrix))
+        frames = np.stack([packed, self.board.next_board().pack()])
+        self.assertTrue(np.array_equal(self.board.unpack(frames)[1], self.board.next_board().matrix))
+        self.board.set_cell_value(0, 0, 1 - self.board.get_cell_value(0, 0))
+        self.assertFalse(np.array_equal(self.board.unpack(packed), self.board.matrix))
+        self.board.load_packed(packed)
+        self.assertTrue(np.array_equal(self.board.unpack(packed), self.board.matrix))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,12 +1,17 @@
 import unittest
+from unittest import mock
 from pathlib import Path
 import sys
 import os
 import numpy as np
 sys.path.insert(0,str(Path(__file__).parent.parent))
-from game_of_life.board import Board
+from game_of_life import simulation as simulation_module
+from game_of_life.board import Board, PackedBoard
 from game_of_life.simulation import Simulation
-from game_of_life.simulation import Video
+from game_of_life.simulation import Frames, Video
+
+_BOARD_CACHE = {}
+"""Boards reused by setUp, cleared before every test"""
 
 
 class SimulationTest(unittest.TestCase):
@@ -16,10 +21,13 @@ class SimulationTest(unittest.TestCase):
 
     def setUp(self):
         
-        """Creates board
+        """Creates board, the same cleared board is reused by every test
         """
 
-        self.board = Board(6,6)
+        if (6, 6) not in _BOARD_CACHE:
+            _BOARD_CACHE[(6, 6)] = Board(6, 6)
+        self.board = _BOARD_CACHE[(6, 6)]
+        self.board.clear()
         self.simulation = Simulation(self.board, max_number_of_steps=1000, stop_simulation=False)
 
     def test_initialization(self):
@@ -95,6 +103,8 @@ class SimulationTest(unittest.TestCase):
         self.assertEqual(result['step_count'], 2)
         self.assertEqual(result['where_is_loop'], 2)
         self.assertLessEqual(s.where_is_loop, 3)
+        self.assertEqual(s.loop_length, 2)
+        self.assertEqual(s.previous_boards[self.board.state_key()], 0)
 
     def test_smoke(self):
 
@@ -143,6 +153,54 @@ class SimulationTest(unittest.TestCase):
         self.assertTrue(result['loop'])
         self.assertEqual(result['why'], 'max_number_of_steps')
         self.assertEqual(result['step_count'], 100)
+        self.assertEqual(result['where_is_loop'], 99)
+        self.assertEqual(len(s.previous_boards), 2)
+
+    def test_step_cache(self):
+
+        """Test if steps after a loop is found give the same boards as computed steps
+        """
+
+        cases = ((Board(8, 8), 4096, 0), (PackedBoard(8, 8), 4096, 64 * 64),
+                 (Board(8, 8), 1, 0), (Board(8, 8), 4096, 64 * 64))
+        for board, cache_size, cache_cells in cases:
+            board.set_cells([(1, 1), (1, 2), (1, 3), (5, 5), (5, 6), (6, 5), (6, 6)])
+            expected = board.copy()
+            with mock.patch.object(simulation_module, 'STEP_CACHE_SIZE', cache_size), \
+                    mock.patch.object(simulation_module, 'STEP_CACHE_CELLS', cache_cells):
+                s = Simulation(board, max_number_of_steps=1000, stop_simulation=False)
+                for _ in range(9):
+                    self.assertTrue(s.simulation_step())
+                    expected.step()
+                    self.assertTrue(np.array_equal(board.matrix, expected.matrix))
+            self.assertEqual(s.loop_length, 2)
+            if isinstance(board, PackedBoard) or cache_cells == 0:
+                self.assertEqual(len(s._step_cache), min(cache_size, 2))
+            else:
+                self.assertEqual(len(s._step_cache), 0)
+            self.assertEqual(board.step_count, 9)
+            self.assertEqual(board.state_key(), expected.state_key())
+        s.reset_simulation()
+        self.assertEqual(len(s._step_cache), 0)
+
+    def test_step_cache_after_set_cells(self):
+
+        """Test if cells set after a loop is found are stepped and not replaced by cached states
+        """
+
+        board = Board(8, 8)
+        board.set_cells([(1, 1), (1, 2), (1, 3)])
+        with mock.patch.object(simulation_module, 'STEP_CACHE_CELLS', 0):
+            s = Simulation(board, max_number_of_steps=1000, stop_simulation=False)
+            for _ in range(4):
+                s.simulation_step()
+            self.assertGreater(len(s._step_cache), 0)
+            board.set_cells([(5, 5), (5, 6), (6, 5), (6, 6)])
+            expected = board.copy()
+            s.simulation_step()
+        expected.step()
+        self.assertTrue(np.array_equal(board.matrix, expected.matrix))
+        self.assertEqual(board.get_cell_value(5, 5), 1)
 
     def test_simulation_step(self):
 
@@ -163,6 +221,69 @@ class SimulationTest(unittest.TestCase):
         self.assertFalse(continue_simulation)
         self.assertTrue(s.loop)
 
+    def test_history_size(self):
+
+        """Test if only the newest states are remembered when the history is full
+        """
+
+        board = Board(20, 20)
+        for r, c in ((0, 1), (1, 2), (2, 0), (2, 1), (2, 2)):
+            board.set_cell_value(r, c, 1)
+        with mock.patch.object(simulation_module, 'HISTORY_SIZE', 5):
+            s = Simulation(board, max_number_of_steps=30, stop_simulation=True)
+            for _ in range(10):
+                self.assertTrue(s.simulation_step())
+        self.assertEqual(len(s.previous_boards), 5)
+        self.assertIn(board.state_key(), s.previous_boards)
+
+    def test_no_false_loop(self):
+
+        """Test if states which differ only in the last bit of two words are not taken for a loop
+        """
+
+        board = Board(10, 130)
+        board.set_cells([(5, 5), (5, 6), (6, 5), (6, 6), (1, 63), (1, 127)])
+        s = Simulation(board, max_number_of_steps=10, stop_simulation=True)
+        result = s.start_simulation()
+        self.assertEqual(result['why'], 'loop')
+        self.assertEqual(result['step_count'], 2)
+        self.assertEqual(s.loop_length, 1)
+
+    def test_brent_cycle_detection(self):
+
+        """Test finding loops with Brent's algorithm
+        """
+
+        self.board.set_cell_value(2,1,1)
+        self.board.set_cell_value(2,2,1)
+        self.board.set_cell_value(2,3,1)
+        s = Simulation(self.board, max_number_of_steps=10, stop_simulation=True, cycle_detection='brent')
+        result = s.start_simulation()
+        self.assertTrue(result['loop'])
+        self.assertEqual(result['why'], 'loop')
+        self.assertLessEqual(result['where_is_loop'], 4)
+        self.assertEqual(s.loop_length, 2)
+        self.assertEqual(len(s.previous_boards), 0)
+        with self.assertRaises(ValueError):
+            Simulation(self.board, cycle_detection='floyd')
+
+    def test_reused_board(self):
+
+        """Test if a cleared board gives the same simulation as a new one
+        """
+
+        results = []
+        for _ in range(2):
+            self.board.clear()
+            self.board.set_cell_value(2,1,1)
+            self.board.set_cell_value(2,2,1)
+            self.board.set_cell_value(2,3,1)
+            s = Simulation(self.board, max_number_of_steps=10, stop_simulation=True)
+            results.append(s.start_simulation())
+            self.assertEqual(len(s.previous_boards), 2)
+        for key in ('loop', 'step_count', 'where_is_loop', 'why'):
+            self.assertEqual(results[0][key], results[1][key])
+
     def test_copy_current_board(self):
 
         """Test returning a copy of matrix
@@ -201,6 +322,7 @@ class SimulationTest(unittest.TestCase):
         s.reset_simulation()
         self.assertFalse(s.loop)
         self.assertIsNone(s.where_is_loop)
+        self.assertIsNone(s.loop_length)
         self.assertEqual(s.board.step_count, 0)
         self.assertEqual(len(s.previous_boards), 1)
     
@@ -219,6 +341,20 @@ class SimulationTest(unittest.TestCase):
         self.assertIn('board', result)
         self.assertIn('where_is_loop', result)
         self.assertIn('why', result)
+        self.assertNotIn('frames', result)
+        self.assertEqual(result['step_count'], result.step_count)
+        self.assertEqual(dict(result)['why'], 'loop')
+        with self.assertRaises(KeyError):
+            result['frames']
+        self.assertEqual(list(result), ['loop', 'step_count', 'board', 'where_is_loop', 'why'])
+        self.assertEqual(len(result), 5)
+        self.assertEqual(result.get('why'), 'loop')
+        self.assertIsNone(result.get('frames'))
+        self.assertEqual(result.get('frames', 0), 0)
+        self.assertTrue(repr(result).startswith("SimResult(loop=True, step_count=2, "))
+        self.assertIn("why='loop'", repr(result))
+        self.assertEqual(result, dict(result))
+        self.assertEqual(dict(result.items()), dict(zip(result.keys(), result.values())))
 
     def test_record(self):
 
@@ -262,6 +398,60 @@ class SimulationTest(unittest.TestCase):
         self.assertIn('why', result)
         self.assertGreaterEqual(len(result['frames']), 2)
         self.assertEqual(result['step_count'], self.simulation.board.step_count)
+        self.assertEqual(len(result), 6)
+        self.assertEqual(list(result)[0], 'frames')
+        self.assertTrue(repr(result).startswith("VideoResult(frames="))
+
+    def test_frames_packed(self):
+
+        """Test if frames are stored bit-packed and read back as matrices
+        """
+
+        video = Video(self.simulation)
+        self.board.set_cell_value(2,1,1)
+        self.board.set_cell_value(2,2,1)
+        self.board.set_cell_value(2,3,1)
+        video.record()
+        video.record()
+        self.assertEqual(video.frames._packed[0].nbytes, 5)
+        self.assertEqual(video.frames[2].shape, (6, 6))
+        self.assertTrue(np.array_equal(video.frames[1:3][1], self.board.matrix))
+        self.assertEqual(len(list(video.frames)), 3)
+        stacked = video.frames.to_array()
+        self.assertEqual(stacked.shape, (3, 6, 6))
+        self.assertTrue(np.array_equal(stacked[2], self.board.matrix))
+
+    def test_frames_step_n(self):
+
+        """Test if step_n() writes every generation into the frames of a video
+        """
+
+        board = Board(600, 100)
+        board.random_board(density=0.3)
+        expected = board.copy()
+        video = Video(Simulation(board, max_number_of_steps=100))
+        board.step_n(20, video.frames)
+        self.assertEqual(len(video.frames), 21)
+        for frame in video.frames[1:]:
+            expected.step()
+            self.assertTrue(np.array_equal(frame, expected.matrix))
+
+    def test_frames_grow(self):
+
+        """Test if frames are kept when the preallocated array is full
+        """
+
+        frames = Frames(self.board, capacity=2)
+        self.assertEqual(frames.to_array().shape, (0, 6, 6))
+        self.board.set_cell_value(2,1,1)
+        self.board.set_cell_value(2,2,1)
+        self.board.set_cell_value(2,3,1)
+        for _ in range(5):
+            frames.append(self.board.pack())
+            self.board.step()
+        self.assertEqual(len(frames), 5)
+        self.assertTrue(np.array_equal(frames[4], frames[0]))
+        self.assertFalse(np.array_equal(frames[3], frames[0]))
 
     def test_get_number_of_frames(self):
         """Test if method return correct number of frames
@@ -351,14 +541,36 @@ class SimulationTest(unittest.TestCase):
             (7,4), (7,9),
             (8,6), (8,7), (8,8)
         ]
-        for r, c in pattern:
-            board.set_cell_value(r, c, 1)
+        board.set_cells(pattern)
         s = Simulation(board, max_number_of_steps=20, stop_simulation=True)
         result = s.start_simulation()
         self.assertTrue(result['loop'])
         self.assertLessEqual(result['step_count'], 20)
         self.assertEqual(result['why'], 'loop')
 
+    def test_packed_board(self):
+
+        """Test if a simulation on the bit-packed board gives the same result
+        """
+
+        boards = [Board(15, 15), PackedBoard(15, 15)]
+        results = []
+        for board in boards:
+            board.set_cell_value(0, 1, 1)
+            board.set_cell_value(1, 2, 1)
+            board.set_cell_value(2, 0, 1)
+            board.set_cell_value(2, 1, 1)
+            board.set_cell_value(2, 2, 1)
+            video = Video(Simulation(board, max_number_of_steps=100, stop_simulation=True))
+            results.append(video.video_run())
+        for key in ('loop', 'step_count', 'where_is_loop', 'why'):
+            self.assertEqual(results[0][key], results[1][key])
+        self.assertTrue(np.array_equal(results[0]['frames'].to_array(), results[1]['frames'].to_array()))
+        frames = []
+        boards[1].step_n(3, frames)
+        self.assertEqual(boards[1].step_count, results[1]['step_count'] + 3)
+        self.assertTrue(np.array_equal(boards[1].unpack(frames[-1]), boards[1].matrix))
+
    
 if __name__ == '__main__':
     unittest.main()